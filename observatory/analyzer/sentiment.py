@@ -1,49 +1,90 @@
-"""Simple sentiment analysis using TextBlob."""
+"""Simple sentiment analysis using TextBlob's polarity lexicon."""
 
-from textblob import TextBlob
-from statistics import mean
+import re
+from math import fsum
+from textblob.en import sentiment as _textblob_sentiment
 from datetime import datetime, timedelta
+from observatory.cache import get_cache
 
 # Cache sentiment results
-_sentiment_cache = {}
 SENTIMENT_CACHE_TTL = 600  # 10 minutes
 
+_WORD_RE = re.compile(r"[a-z']+")
+_NEGATIONS = frozenset({"not", "no", "never"})
+
+
+def _load_lexicon() -> dict[str, float]:
+    """Flatten TextBlob's en-sentiment.xml into a plain word -> polarity dict."""
+    # TextBlob's tokenizer splits contractions ("isn't" -> "is", "n't"), so
+    # its entries for them never match a word; leave them out here too
+    return {
+        word: tags[None][0]
+        for word, tags in _textblob_sentiment.items()
+        if _WORD_RE.fullmatch(word) and "'" not in word
+    }
+
+
+# Loaded once at import so scoring is a regex scan plus dict lookups
+_LEXICON = _load_lexicon()
+
 
 def analyze_sentiment(text: str) -> float:
     """
     Analyze sentiment of text.
     
+    Averages the polarity of every lexicon word in the text, flipping and
+    halving a word preceded by a negation ("not good" scores -0.35).
+    
     Returns polarity from -1.0 (negative) to +1.0 (positive).
     """
     if not text:
         return 0.0
     
-    blob = TextBlob(text)
-    return blob.sentiment.polarity
+    return score_texts([text])[0]
+
+
+def score_texts(texts: list[str]) -> list[float]:
+    """
+    Score many texts in one pass, sharing the lexicon and regex lookups.
+    
+    Returns one polarity per text, identical to calling analyze_sentiment
+    on each text in turn.
+    """
+    scores = []
+    append = scores.append
+    findall = _WORD_RE.findall
+    lexicon_get = _LEXICON.get
+    negations = _NEGATIONS
+    for text in texts:
+        total = 0.0
+        n = 0
+        prev = None
+        for token in findall(text.lower()):
+            polarity = lexicon_get(token)
+            if polarity is not None:
+                if prev in negations:
+                    polarity *= -0.5
+                total += polarity
+                n += 1
+            prev = token
+        append(total / n if n else 0.0)
+    return scores
+
+
+# Ordered from most negative to most positive; indexed by how many
+# thresholds the polarity clears
+_LABELS = ("negative", "neutral", "positive")
+_EMOJIS = ("😞", "😐", "😶", "🙂", "😊")
 
 
 def get_sentiment_label(polarity: float) -> str:
     """Get a human-readable label for sentiment polarity."""
-    if polarity >= 0.3:
-        return "positive"
-    elif polarity <= -0.3:
-        return "negative"
-    else:
-        return "neutral"
+    return _LABELS[(polarity > -0.3) + (polarity >= 0.3)]
 
 
 def get_sentiment_emoji(polarity: float) -> str:
     """Get an emoji representing the sentiment."""
-    if polarity >= 0.5:
-        return "😊"
-    elif polarity >= 0.2:
-        return "🙂"
-    elif polarity <= -0.5:
-        return "😞"
-    elif polarity <= -0.2:
-        return "😐"
-    else:
-        return "😶"
+    return _EMOJIS[(polarity > -0.5) + (polarity > -0.2) + (polarity >= 0.2) + (polarity >= 0.5)]
 
 
 def average_sentiment(texts: list[str]) -> float:
@@ -51,27 +92,28 @@ def average_sentiment(texts: list[str]) -> float:
     if not texts:
         return 0.0
     
-    scores = [analyze_sentiment(t) for t in texts if t]
-    return mean(scores) if scores else 0.0
+    scores = score_texts([t for t in texts if t])
+    return fsum(scores) / len(scores) if scores else 0.0
 
 
 async def get_recent_sentiment(hours: int = 24) -> dict:
     """Get average sentiment for recent posts using optimized sampling and caching."""
-    from observatory.database.connection import execute_query
-    
-    # Check cache first
-    cache_key = f"sentiment_{hours}"
-    now = datetime.utcnow()
-    if cache_key in _sentiment_cache:
-        cached_result, cached_time = _sentiment_cache[cache_key]
-        if (now - cached_time).total_seconds() < SENTIMENT_CACHE_TTL:
-            return cached_result
+    return await get_cache().get_or_compute(
+        f"sentiment_{hours}",
+        lambda: _compute_recent_sentiment(hours),
+        SENTIMENT_CACHE_TTL,
+    )
+
+
+async def _compute_recent_sentiment(hours: int) -> dict:
+    """Score a sample of recent posts (uncached)."""
+    from observatory.database.connection import execute_query_rows
     
-    start = (now - timedelta(hours=hours)).isoformat()
+    start = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
     
     # Optimize: Get only a sample of recent posts instead of all
     # Sample 500 posts max to avoid processing huge amounts of text
-    posts = await execute_query("""
+    posts = await execute_query_rows("""
         SELECT title, content FROM posts
         WHERE created_at >= ?
         ORDER BY created_at DESC
@@ -79,27 +121,20 @@ async def get_recent_sentiment(hours: int = 24) -> dict:
     """, (start,))
     
     if not posts:
-        result = {"polarity": 0.0, "label": "neutral", "emoji": "😶", "sample_size": 0}
-        _sentiment_cache[cache_key] = (result, now)
-        return result
+        return {"polarity": 0.0, "label": "neutral", "emoji": "😶", "sample_size": 0}
     
     # Only analyze title + content if both present (avoid empty strings)
-    texts = [f"{p.get('title', '')} {p.get('content', '')}".strip() 
-             for p in posts if p.get('title') or p.get('content')]
+    texts = [f"{p['title']} {p['content']}".strip() 
+             for p in posts if p['title'] or p['content']]
     
     if not texts:
-        result = {"polarity": 0.0, "label": "neutral", "emoji": "😶", "sample_size": 0}
-        _sentiment_cache[cache_key] = (result, now)
-        return result
+        return {"polarity": 0.0, "label": "neutral", "emoji": "😶", "sample_size": 0}
     
     avg = average_sentiment(texts)
     
-    result = {
+    return {
         "polarity": round(avg, 2),
         "label": get_sentiment_label(avg),
         "emoji": get_sentiment_emoji(avg),
         "sample_size": len(texts),
     }
-    
-    _sentiment_cache[cache_key] = (result, now)
-    return result
@@ -1,33 +1,30 @@
 """Aggregate statistics and snapshots."""
 
-import json
+import orjson
 from datetime import datetime, timedelta
 from functools import lru_cache
-from observatory.database.connection import get_db, execute_query
+from observatory.cache import get_cache
+from observatory.database.connection import write_transaction, execute_query, execute_query_rows
 
 # Cache stats for 5 minutes to reduce query load
-_stats_cache = None
-_stats_cache_time = None
+STATS_CACHE_KEY = "stats"
 STATS_CACHE_TTL = 300  # 5 minutes
 
 
 async def get_stats() -> dict:
     """Get current platform statistics with caching."""
-    global _stats_cache, _stats_cache_time
-    
-    # Return cached result if still valid
-    now = datetime.utcnow()
-    if _stats_cache is not None and _stats_cache_time is not None:
-        if (now - _stats_cache_time).total_seconds() < STATS_CACHE_TTL:
-            return _stats_cache
-    
+    return await get_cache().get_or_compute(STATS_CACHE_KEY, _compute_stats, STATS_CACHE_TTL)
+
+
+async def _compute_stats() -> dict:
+    """Query current platform statistics (uncached)."""
     # Get all counts in a single query
-    now_iso = now.isoformat()
+    now = datetime.utcnow()
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
     one_hour_ago = (now - timedelta(hours=1)).isoformat()
     one_day_ago = (now - timedelta(hours=24)).isoformat()
     
-    result = await execute_query("""
+    result = await execute_query_rows("""
         SELECT
             (SELECT COUNT(*) FROM agents) as total_agents,
             (SELECT COUNT(*) FROM posts) as total_posts,
@@ -39,7 +36,7 @@ async def get_stats() -> dict:
     """, (today_start, one_hour_ago, one_day_ago))
     
     if result:
-        _stats_cache = {
+        return {
             "total_agents": result[0]["total_agents"],
             "total_posts": result[0]["total_posts"],
             "total_comments": result[0]["total_comments"],
@@ -48,8 +45,6 @@ async def get_stats() -> dict:
             "active_agents_1h": result[0]["active_agents_1h"],
             "active_agents_24h": result[0]["active_agents_24h"],
         }
-        _stats_cache_time = now
-        return _stats_cache
     
     return {
         "total_agents": 0,
@@ -64,9 +59,7 @@ async def get_stats() -> dict:
 
 def invalidate_stats_cache() -> None:
     """Invalidate the stats cache."""
-    global _stats_cache, _stats_cache_time
-    _stats_cache = None
-    _stats_cache_time = None
+    get_cache().clear(STATS_CACHE_KEY)
 
 
 async def get_new_agents_today() -> list[dict]:
@@ -87,28 +80,31 @@ async def create_snapshot() -> None:
     from observatory.analyzer.trends import get_top_words
     from observatory.analyzer.sentiment import get_recent_sentiment
     
-    db = await get_db()
     stats = await get_stats()
     sentiment = await get_recent_sentiment(hours=1)
     top_words = await get_top_words(hours=1, limit=10)
+    words = [w["word"] for w in top_words]
     
-    await db.execute("""
-        INSERT INTO snapshots (
-            timestamp, total_agents, total_posts, total_comments,
-            active_agents_24h, avg_sentiment, top_words
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
-        datetime.utcnow().isoformat(),
-        stats["total_agents"],
-        stats["total_posts"],
-        stats["total_comments"],
-        stats["active_agents_24h"],
-        sentiment["polarity"],
-        json.dumps([w["word"] for w in top_words]),
-    ))
-    
-    await db.commit()
+    async with write_transaction() as db:
+        cursor = await db.execute("""
+            INSERT INTO snapshots (
+                timestamp, total_agents, total_posts, total_comments,
+                active_agents_24h, avg_sentiment, top_words
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            datetime.utcnow().isoformat(),
+            stats["total_agents"],
+            stats["total_posts"],
+            stats["total_comments"],
+            stats["active_agents_24h"],
+            sentiment["polarity"],
+            orjson.dumps(words).decode(),
+        ))
+        await db.executemany("""
+            INSERT INTO snapshot_top_words (snapshot_id, pos, word)
+            VALUES (?, ?, ?)
+        """, [(cursor.lastrowid, pos, word) for pos, word in enumerate(words)])
 
 
 async def get_snapshot_history(hours: int = 168) -> list[dict]:
@@ -116,20 +112,38 @@ async def get_snapshot_history(hours: int = 168) -> list[dict]:
     start = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
     
     snapshots = await execute_query("""
-        SELECT timestamp, total_agents, total_posts, total_comments,
-               active_agents_24h, avg_sentiment, top_words
-        FROM snapshots
-        WHERE timestamp >= ?
-        ORDER BY timestamp ASC
+        SELECT s.id, s.timestamp, s.total_agents, s.total_posts, s.total_comments,
+               s.active_agents_24h, s.avg_sentiment, s.top_words
+        FROM snapshots s
+        WHERE s.timestamp >= ?
+        ORDER BY s.timestamp ASC
     """, (start,))
     
-    # Parse top_words JSON
+    # GROUP_CONCAT has no defined order on this SQLite, so fetch the words
+    # sorted by position and assemble each snapshot's list here
+    words_by_snapshot: dict[int, list[str]] = {}
+    for row in await execute_query_rows("""
+        SELECT w.snapshot_id, w.word
+        FROM snapshot_top_words w
+        JOIN snapshots s ON s.id = w.snapshot_id
+        WHERE s.timestamp >= ?
+        ORDER BY w.snapshot_id, w.pos
+    """, (start,)):
+        words_by_snapshot.setdefault(row[0], []).append(row[1])
+    
     for s in snapshots:
-        if s.get("top_words"):
+        top_words_json = s.pop("top_words")
+        words = words_by_snapshot.get(s.pop("id"))
+        if words:
+            s["top_words"] = words
+        elif top_words_json:
+            # Snapshots taken before snapshot_top_words existed
             try:
-                s["top_words"] = json.loads(s["top_words"])
-            except json.JSONDecodeError:
+                s["top_words"] = orjson.loads(top_words_json)
+            except orjson.JSONDecodeError:
                 s["top_words"] = []
+        else:
+            s["top_words"] = None
     
     return snapshots
 
@@ -1,6 +1,6 @@
 """Helper functions to get stats from database."""
 
-from observatory.database.connection import execute_query
+from observatory.database.connection import execute_query_rows
 
 
 async def get_agent_stats(agent_name: str) -> dict:
@@ -14,7 +14,7 @@ async def get_agent_stats(agent_name: str) -> dict:
         Dict with post_count calculated from posts table
     """
     # Get post count from database
-    post_result = await execute_query("""
+    post_result = await execute_query_rows("""
         SELECT COUNT(*) as post_count FROM posts WHERE agent_name = ?
     """, (agent_name,))
     
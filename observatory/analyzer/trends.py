@@ -3,14 +3,14 @@
 import re
 from collections import Counter
 from datetime import datetime, timedelta
-from observatory.database.connection import get_db, execute_query
+from observatory.cache import get_cache
+from observatory.database.connection import write_transaction, execute_query, execute_query_rows
 
 # Cache trending words
-_trends_cache = {}
 TRENDS_CACHE_TTL = 600  # 10 minutes
 
 # Common stop words to ignore
-STOP_WORDS = {
+STOP_WORDS = frozenset({
     'the', 'a', 'an', 'is', 'are', 'was', 'were', 'i', 'you', 'we', 'they',
     'it', 'this', 'that', 'to', 'of', 'and', 'or', 'for', 'in', 'on', 'at',
     'be', 'have', 'has', 'had', 'do', 'does', 'did', 'but', 'not', 'what',
@@ -28,26 +28,33 @@ STOP_WORDS = {
     'two', 'first', 'like', 'get', 'got', 'make', 'made', 'know', 'think',
     'see', 'come', 'want', 'look', 'use', 'find', 'give', 'tell', 'try',
     'really', 'still', 'thing', 'things', 'something', 'anything', 'nothing'
-}
+})
+
+# Words with 3+ characters (text is lowercased before matching)
+_WORD_RE = re.compile(r'\b[a-z]{3,}\b')
+
+
+def _iso_ago(now: datetime, hours: int) -> str:
+    """ISO timestamp for the given number of hours before now."""
+    return (now - timedelta(hours=hours)).isoformat()
 
 
 def extract_words(text: str) -> list[str]:
     """Extract meaningful words from text."""
     if not text:
         return []
-    # Find words with 3+ characters
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-    return [w for w in words if w not in STOP_WORDS]
+    words = _WORD_RE.findall(text.lower())
+    stop_words = STOP_WORDS
+    return [w for w in words if w not in stop_words]
 
 
 async def update_word_frequency() -> None:
     """Update word frequency counts for recent posts."""
-    db = await get_db()
-    
     # Get posts from the last hour
-    one_hour_ago = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+    now = datetime.utcnow()
+    one_hour_ago = _iso_ago(now, 1)
     
-    posts = await execute_query("""
+    posts = await execute_query_rows("""
         SELECT title, content FROM posts
         WHERE fetched_at >= ?
     """, (one_hour_ago,))
@@ -55,23 +62,20 @@ async def update_word_frequency() -> None:
     if not posts:
         return
     
-    # Count words
-    word_counts = Counter()
-    for post in posts:
-        text = f"{post.get('title', '')} {post.get('content', '')}"
-        word_counts.update(extract_words(text))
+    # Count words in one regex pass over all posts
+    text = "\n".join(f"{post['title']} {post['content']}" for post in posts)
+    word_counts = Counter(extract_words(text))
     
     # Store in database
-    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0).isoformat()
+    current_hour = now.replace(minute=0, second=0, microsecond=0).isoformat()
     
-    for word, count in word_counts.most_common(100):
-        await db.execute("""
+    rows = [(word, current_hour, count) for word, count in word_counts.most_common(100)]
+    async with write_transaction() as db:
+        await db.executemany("""
             INSERT INTO word_frequency (word, hour, count)
             VALUES (?, ?, ?)
             ON CONFLICT (word, hour) DO UPDATE SET count = count + excluded.count
-        """, (word, current_hour, count))
-    
-    await db.commit()
+        """, rows)
 
 
 async def get_trending_words(hours: int = 24, limit: int = 10) -> list[dict]:
@@ -80,52 +84,45 @@ async def get_trending_words(hours: int = 24, limit: int = 10) -> list[dict]:
     
     Returns list of {word, count, previous_count, change_percent}
     """
-    # Check cache first
-    cache_key = f"trends_{hours}_{limit}"
+    return await get_cache().get_or_compute(
+        f"trends_{hours}_{limit}",
+        lambda: _compute_trending_words(hours, limit),
+        TRENDS_CACHE_TTL,
+    )
+
+
+async def _compute_trending_words(hours: int, limit: int) -> list[dict]:
+    """Compare word counts between the current and previous period (uncached)."""
     now = datetime.utcnow()
-    if cache_key in _trends_cache:
-        cached_result, cached_time = _trends_cache[cache_key]
-        if (now - cached_time).total_seconds() < TRENDS_CACHE_TTL:
-            return cached_result
-    
-    current_start = (now - timedelta(hours=hours)).isoformat()
-    previous_start = (now - timedelta(hours=hours * 2)).isoformat()
-    previous_end = current_start
-    
-    # Get current period counts - only top 100 to reduce processing
-    current = await execute_query("""
-        SELECT word, SUM(count) as total
-        FROM word_frequency
-        WHERE hour >= ?
-        GROUP BY word
-        ORDER BY total DESC
-        LIMIT 100
-    """, (current_start,))
-    
-    # Get previous period counts - only for words we found in current period
-    if not current:
-        result = []
-        _trends_cache[cache_key] = (result, now)
-        return result
-    
-    current_words = [w['word'] for w in current]
-    
-    # Use IN clause to fetch only relevant previous data
-    placeholders = ','.join(['?' for _ in current_words])
-    previous = await execute_query(f"""
-        SELECT word, SUM(count) as total
-        FROM word_frequency
-        WHERE hour >= ? AND hour < ? AND word IN ({placeholders})
-        GROUP BY word
-    """, (previous_start, previous_end, *current_words))
-    
-    previous_counts = {p['word']: p['total'] for p in previous}
+    current_start = _iso_ago(now, hours)
+    previous_start = _iso_ago(now, hours * 2)
+    
+    # Top 100 words of the current period, each with its previous-period
+    # count looked up on the (word, hour) index; one fixed SQL string
+    current = await execute_query_rows("""
+        WITH cur AS (
+            SELECT word, SUM(count) as total
+            FROM word_frequency
+            WHERE hour >= ?1
+            GROUP BY word
+            ORDER BY total DESC
+            LIMIT 100
+        )
+        SELECT cur.word, cur.total,
+               COALESCE((
+                   SELECT SUM(prev.count)
+                   FROM word_frequency prev
+                   WHERE prev.word = cur.word AND prev.hour >= ?2 AND prev.hour < ?1
+               ), 0) as previous_total
+        FROM cur
+        ORDER BY cur.total DESC
+    """, (current_start, previous_start))
     
     trends = []
     for word_data in current:
         word = word_data['word']
         current_count = word_data['total']
-        prev_count = previous_counts.get(word, 0)
+        prev_count = word_data['previous_total']
         
         if prev_count == 0:
             change = float('inf') if current_count > 2 else 0
@@ -142,14 +139,12 @@ async def get_trending_words(hours: int = 24, limit: int = 10) -> list[dict]:
     
     # Sort by change percentage
     trends.sort(key=lambda x: x['change_percent'], reverse=True)
-    result = trends[:limit]
-    _trends_cache[cache_key] = (result, now)
-    return result
+    return trends[:limit]
 
 
 async def get_top_words(hours: int = 24, limit: int = 20) -> list[dict]:
     """Get most frequent words in the given time period."""
-    start = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+    start = _iso_ago(datetime.utcnow(), hours)
     
     return await execute_query("""
         SELECT word, SUM(count) as total
@@ -163,7 +158,7 @@ async def get_top_words(hours: int = 24, limit: int = 20) -> list[dict]:
 
 async def get_word_history(word: str, days: int = 7) -> list[dict]:
     """Get hourly frequency history for a specific word."""
-    start = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    start = _iso_ago(datetime.utcnow(), days * 24)
     
     return await execute_query("""
         SELECT hour, count
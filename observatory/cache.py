@@ -1,21 +1,22 @@
 """Response caching utility for performance optimization."""
 
-from datetime import datetime, timedelta
+import asyncio
+from time import monotonic
 from typing import Any, Optional, Callable, Awaitable
 
 
 class CacheEntry:
     """A single cache entry with TTL."""
     
+    __slots__ = ("data", "expires_at")
+    
     def __init__(self, data: Any, ttl_seconds: int):
         self.data = data
-        self.created_at = datetime.utcnow()
-        self.ttl_seconds = ttl_seconds
+        self.expires_at = monotonic() + ttl_seconds
     
     def is_expired(self) -> bool:
         """Check if cache entry has expired."""
-        elapsed = (datetime.utcnow() - self.created_at).total_seconds()
-        return elapsed > self.ttl_seconds
+        return monotonic() > self.expires_at
     
     def get(self) -> Optional[Any]:
         """Get cached data if not expired."""
@@ -29,18 +30,20 @@ class Cache:
     
     def __init__(self):
         self._cache: dict[str, CacheEntry] = {}
+        # Per-key locks so concurrent misses compute a value only once
+        self._locks: dict[str, asyncio.Lock] = {}
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if exists and not expired."""
-        if key not in self._cache:
+        entry = self._cache.get(key)
+        if entry is None:
             return None
         
-        entry = self._cache[key]
-        if entry.is_expired():
+        if monotonic() > entry.expires_at:
             del self._cache[key]
             return None
         
-        return entry.get()
+        return entry.data
     
     def set(self, key: str, value: Any, ttl_seconds: int = 300) -> None:
         """Set value in cache with TTL."""
@@ -50,10 +53,28 @@ class Cache:
         """Clear a specific cache key."""
         if key in self._cache:
             del self._cache[key]
+        self._drop_lock(key)
     
     def clear_all(self) -> None:
         """Clear all cache."""
         self._cache.clear()
+        for key in list(self._locks):
+            self._drop_lock(key)
+    
+    def _drop_lock(self, key: str) -> None:
+        """Forget the compute lock for a key unless a computation holds it."""
+        lock = self._locks.get(key)
+        if lock is not None and not lock.locked():
+            del self._locks[key]
+    
+    def sweep_expired(self) -> int:
+        """Remove all expired entries. Returns number of entries removed."""
+        expired = [key for key, entry in self._cache.items() if entry.is_expired()]
+        for key in expired:
+            del self._cache[key]
+        for key in [k for k in self._locks if k not in self._cache]:
+            self._drop_lock(key)
+        return len(expired)
     
     async def get_or_compute(
         self,
@@ -61,14 +82,26 @@ class Cache:
         compute_fn: Callable[[], Awaitable[Any]],
         ttl_seconds: int = 300
     ) -> Any:
-        """Get from cache or compute value if not cached."""
+        """Get from cache or compute value if not cached.
+        
+        Concurrent callers that miss on the same key wait for the first
+        caller's result instead of computing it again.
+        """
         cached = self.get(key)
         if cached is not None:
             return cached
         
-        result = await compute_fn()
-        self.set(key, result, ttl_seconds)
-        return result
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        async with lock:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            
+            result = await compute_fn()
+            self.set(key, result, ttl_seconds)
+            return result
 
 
 # Global cache instance
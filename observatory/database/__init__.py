@@ -1,6 +1,6 @@
 """Database module."""
 
-from observatory.database.connection import get_db, close_db
+from observatory.database.connection import get_db, close_db, write_transaction
 from observatory.database.migrations import init_db
 
-__all__ = ["get_db", "close_db", "init_db"]
+__all__ = ["get_db", "close_db", "write_transaction", "init_db"]
@@ -1,35 +1,118 @@
 """Database connection handling."""
 
+import asyncio
 import aiosqlite
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator
 from observatory.config import config
 
-# Global database connection
+# Number of read-only connections used by execute_query
+READ_POOL_SIZE = 4
+
+# Prepared statements kept per connection (sqlite3 defaults to 128)
+STATEMENT_CACHE_SIZE = 512
+
+# Global database connection (the single writer)
 _db: aiosqlite.Connection | None = None
+_db_lock = asyncio.Lock()
+
+# Held for the whole of each write transaction on the shared writer
+_write_lock = asyncio.Lock()
+
+# Read-only connections; WAL lets them read while the writer commits
+_read_pool: asyncio.Queue | None = None
+_read_conns: list[aiosqlite.Connection] = []
+_read_pool_lock = asyncio.Lock()
+
+
+async def _apply_pragmas(db: aiosqlite.Connection) -> None:
+    """Apply per-connection settings shared by the writer and readers."""
+    db.row_factory = aiosqlite.Row
+    # Enable foreign keys
+    await db.execute("PRAGMA foreign_keys = ON")
+    # Performance optimizations
+    await db.execute("PRAGMA cache_size = -65536")  # 64MiB cache
+    await db.execute("PRAGMA temp_store = MEMORY")
+    await db.execute("PRAGMA mmap_size = 268435456")  # 256MiB mmap
 
 
 async def get_db() -> aiosqlite.Connection:
     """Get the database connection, creating it if necessary."""
     global _db
     if _db is None:
-        config.ensure_data_dir()
-        _db = await aiosqlite.connect(config.DATABASE_PATH)
-        _db.row_factory = aiosqlite.Row
-        # Enable foreign keys
-        await _db.execute("PRAGMA foreign_keys = ON")
-        # Performance optimizations
-        await _db.execute("PRAGMA journal_mode = WAL")
-        await _db.execute("PRAGMA synchronous = NORMAL")
-        await _db.execute("PRAGMA cache_size = -64000")  # 64MB cache
-        await _db.execute("PRAGMA temp_store = MEMORY")
-        await _db.execute("PRAGMA mmap_size = 30000000")  # 30MB mmap
-        await _db.execute("PRAGMA page_size = 4096")
+        # Concurrent first callers must not each open a writer
+        async with _db_lock:
+            if _db is None:
+                config.ensure_data_dir()
+                db = await aiosqlite.connect(
+                    config.DATABASE_PATH, cached_statements=STATEMENT_CACHE_SIZE
+                )
+                await _apply_pragmas(db)
+                await db.execute("PRAGMA journal_mode = WAL")
+                await db.execute("PRAGMA synchronous = NORMAL")
+                await db.execute("PRAGMA page_size = 4096")
+                _db = db
     return _db
 
 
+async def _get_read_pool() -> asyncio.Queue:
+    """Get the read-only connection pool, opening it if necessary."""
+    global _read_pool
+    if _read_pool is None:
+        async with _read_pool_lock:
+            if _read_pool is None:
+                # The writer creates the file and switches it to WAL first
+                await get_db()
+                uri = f"{config.DATABASE_PATH.resolve().as_uri()}?mode=ro"
+                pool = asyncio.Queue()
+                for _ in range(READ_POOL_SIZE):
+                    conn = await aiosqlite.connect(
+                        uri, uri=True, cached_statements=STATEMENT_CACHE_SIZE
+                    )
+                    await _apply_pragmas(conn)
+                    _read_conns.append(conn)
+                    pool.put_nowait(conn)
+                _read_pool = pool
+    return _read_pool
+
+
+@asynccontextmanager
+async def acquire_read() -> AsyncIterator[aiosqlite.Connection]:
+    """Borrow a read-only connection from the pool."""
+    pool = await _get_read_pool()
+    conn = await pool.get()
+    try:
+        yield conn
+    finally:
+        pool.put_nowait(conn)
+
+
+@asynccontextmanager
+async def write_transaction() -> AsyncIterator[aiosqlite.Connection]:
+    """
+    Run one write transaction on the shared writer: BEGIN IMMEDIATE on
+    entry, COMMIT on success, ROLLBACK if the body raises. Transactions
+    queue behind each other, so one can never commit or roll back
+    another's writes. Not reentrant.
+    """
+    db = await get_db()
+    async with _write_lock:
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            await db.rollback()
+            raise
+        await db.commit()
+
+
 async def close_db() -> None:
-    """Close the database connection."""
-    global _db
+    """Close the database connection and the read pool."""
+    global _db, _read_pool
+    _read_pool = None
+    while _read_conns:
+        await _read_conns.pop().close()
     if _db is not None:
         await _db.close()
         _db = None
@@ -37,22 +120,27 @@ async def close_db() -> None:
 
 async def execute_query(query: str, params: tuple = ()) -> list[dict]:
     """Execute a query and return results as list of dicts."""
-    db = await get_db()
-    async with db.execute(query, params) as cursor:
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    rows = await execute_query_rows(query, params)
+    if not rows:
+        return []
+    keys = rows[0].keys()
+    return [dict(zip(keys, row)) for row in rows]
+
+
+async def execute_query_rows(query: str, params: tuple = ()) -> list[aiosqlite.Row]:
+    """Execute a query and return the raw rows (read-only, key-indexable)."""
+    async with acquire_read() as db:
+        return await db.execute_fetchall(query, params)
 
 
 async def execute_insert(query: str, params: tuple = ()) -> int:
     """Execute an insert and return the last row id."""
-    db = await get_db()
-    async with db.execute(query, params) as cursor:
-        await db.commit()
-        return cursor.lastrowid
+    async with write_transaction() as db:
+        async with db.execute(query, params) as cursor:
+            return cursor.lastrowid
 
 
 async def execute_many(query: str, params_list: list[tuple]) -> None:
     """Execute many inserts."""
-    db = await get_db()
-    await db.executemany(query, params_list)
-    await db.commit()
+    async with write_transaction() as db:
+        await db.executemany(query, params_list)
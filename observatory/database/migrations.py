@@ -81,6 +81,14 @@ CREATE TABLE IF NOT EXISTS snapshots (
     top_words TEXT
 );
 
+-- Top words per snapshot in rank order (read without JSON parsing)
+CREATE TABLE IF NOT EXISTS snapshot_top_words (
+    snapshot_id INTEGER REFERENCES snapshots(id),
+    pos INTEGER,
+    word TEXT,
+    PRIMARY KEY (snapshot_id, pos)
+);
+
 -- For trend detection
 CREATE TABLE IF NOT EXISTS word_frequency (
     word TEXT,
@@ -95,12 +103,18 @@ CREATE INDEX IF NOT EXISTS idx_posts_submolt ON posts(submolt);
 CREATE INDEX IF NOT EXISTS idx_posts_agent_id ON posts(agent_id);
 CREATE INDEX IF NOT EXISTS idx_posts_agent_name ON posts(agent_name);
 CREATE INDEX IF NOT EXISTS idx_posts_agent_created ON posts(agent_name, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_created_agent ON posts(created_at, agent_name);
+CREATE INDEX IF NOT EXISTS idx_posts_agent_score ON posts(agent_name, score, created_at)
+    WHERE agent_name IS NOT NULL AND agent_name != '';
+CREATE INDEX IF NOT EXISTS idx_posts_submolt_score ON posts(submolt, agent_name, score, created_at)
+    WHERE submolt IS NOT NULL AND submolt != '';
 CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id);
 CREATE INDEX IF NOT EXISTS idx_agents_karma ON agents(karma DESC);
 CREATE INDEX IF NOT EXISTS idx_agents_follower_count ON agents(follower_count DESC);
 CREATE INDEX IF NOT EXISTS idx_agents_name ON agents(name);
 CREATE INDEX IF NOT EXISTS idx_word_frequency_hour ON word_frequency(hour DESC);
 CREATE INDEX IF NOT EXISTS idx_word_frequency_word_hour ON word_frequency(word, hour DESC);
+CREATE INDEX IF NOT EXISTS idx_word_frequency_hour_word ON word_frequency(hour, word, count);
 CREATE INDEX IF NOT EXISTS idx_submolts_subscriber ON submolts(subscriber_count DESC);
 CREATE INDEX IF NOT EXISTS idx_submolts_post_count ON submolts(post_count DESC);
 """
@@ -110,5 +124,7 @@ async def init_db() -> None:
     """Initialize the database schema."""
     db = await get_db()
     await db.executescript(SCHEMA)
+    # Refresh planner statistics for any index that was just created
+    await db.execute("PRAGMA optimize")
     await db.commit()
     print("Database initialized successfully")
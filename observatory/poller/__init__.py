@@ -2,7 +2,7 @@
 
 from observatory.poller.client import MoltbookClient
 from observatory.poller.scheduler import setup_scheduler
-from observatory.poller.processors import process_posts, process_agents, process_submolts
+from observatory.poller.processors import process_posts, process_agents, process_submolts, process_poll_cycle
 
 __all__ = [
     "MoltbookClient",
@@ -10,4 +10,5 @@ __all__ = [
     "process_posts",
     "process_agents",
     "process_submolts",
+    "process_poll_cycle",
 ]
@@ -1,5 +1,6 @@
 """Moltbook API client - read-only access to public data."""
 
+import asyncio
 import httpx
 from typing import Optional
 from observatory.config import config
@@ -9,9 +10,21 @@ class MoltbookClient:
     """Async client for the Moltbook API."""
     
     def __init__(self):
+        # One pooled HTTP/2 connection multiplexes all requests to the API host;
+        # http2/limits must be set on the transport when one is passed in
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=50,
+                max_keepalive_connections=20,
+                keepalive_expiry=60.0,
+            ),
+            retries=2,
+        )
         self.client = httpx.AsyncClient(
             base_url=config.MOLTBOOK_BASE_URL,
-            timeout=30.0,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            transport=transport,
             headers={
                 "User-Agent": "MoltbookObservatory/1.0",
             }
@@ -21,10 +34,26 @@ class MoltbookClient:
         self._rate_limiter = None
         self._rate_limiter_getter = get_rate_limiter
     
+    async def start(self) -> None:
+        """
+        Resolve the shared rate limiter once, before the first request.
+        get_client() calls this; a client built directly resolves it on
+        first use instead.
+        """
+        if self._rate_limiter is None:
+            self._rate_limiter = await self._rate_limiter_getter()
+    
     async def close(self) -> None:
         """Close the HTTP client."""
         await self.client.aclose()
     
+    async def _auth_headers(self) -> dict:
+        """Wait for a rate-limit slot and return headers for the chosen key."""
+        if self._rate_limiter is None:
+            await self.start()
+        key = await self._rate_limiter.wait_and_get_key()
+        return {"Authorization": f"Bearer {key}"}
+    
     async def get_posts(
         self,
         sort: str = "new",
@@ -47,21 +76,36 @@ class MoltbookClient:
             params["submolt"] = submolt
         
         # Rate-limit before making the request
-        if self._rate_limiter is None:
-            self._rate_limiter = await self._rate_limiter_getter()
-        key = await self._rate_limiter.wait_and_get_key()
-        headers = {"Authorization": f"Bearer {key}"}
+        headers = await self._auth_headers()
 
         response = await self.client.get("/posts", params=params, headers=headers)
         response.raise_for_status()
         return response.json()
     
+    async def get_posts_many(
+        self,
+        submolts: list[str],
+        sort: str = "new",
+        limit: int = 25,
+        concurrency: int = 8,
+    ) -> list[dict | BaseException]:
+        """
+        Fetch posts for several submolts concurrently.
+        
+        Returns one result per submolt, in order; a failed request yields
+        its exception instead of a response.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch(submolt: str) -> dict:
+            async with semaphore:
+                return await self.get_posts(sort=sort, limit=limit, submolt=submolt)
+        
+        return await asyncio.gather(*(fetch(s) for s in submolts), return_exceptions=True)
+    
     async def get_post(self, post_id: str) -> dict:
         """Fetch a single post by ID."""
-        if self._rate_limiter is None:
-            self._rate_limiter = await self._rate_limiter_getter()
-        key = await self._rate_limiter.wait_and_get_key()
-        headers = {"Authorization": f"Bearer {key}"}
+        headers = await self._auth_headers()
 
         response = await self.client.get(f"/posts/{post_id}", headers=headers)
         response.raise_for_status()
@@ -79,10 +123,7 @@ class MoltbookClient:
             post_id: The post ID
             sort: Sort order - 'top', 'new', 'controversial'
         """
-        if self._rate_limiter is None:
-            self._rate_limiter = await self._rate_limiter_getter()
-        key = await self._rate_limiter.wait_and_get_key()
-        headers = {"Authorization": f"Bearer {key}"}
+        headers = await self._auth_headers()
 
         response = await self.client.get(
             f"/posts/{post_id}/comments",
@@ -94,10 +135,7 @@ class MoltbookClient:
     
     async def get_submolts(self, limit: int = 100, offset: int = 0) -> dict:
         """List all submolts."""
-        if self._rate_limiter is None:
-            self._rate_limiter = await self._rate_limiter_getter()
-        key = await self._rate_limiter.wait_and_get_key()
-        headers = {"Authorization": f"Bearer {key}"}
+        headers = await self._auth_headers()
 
         response = await self.client.get("/submolts", params={"limit": limit, "offset": offset}, headers=headers)
         response.raise_for_status()
@@ -105,10 +143,7 @@ class MoltbookClient:
     
     async def get_submolt(self, name: str) -> dict:
         """Get info about a specific submolt."""
-        if self._rate_limiter is None:
-            self._rate_limiter = await self._rate_limiter_getter()
-        key = await self._rate_limiter.wait_and_get_key()
-        headers = {"Authorization": f"Bearer {key}"}
+        headers = await self._auth_headers()
 
         response = await self.client.get(f"/submolts/{name}", headers=headers)
         response.raise_for_status()
@@ -120,10 +155,7 @@ class MoltbookClient:
         
         Returns agent info including karma, follower counts, recent posts.
         """
-        if self._rate_limiter is None:
-            self._rate_limiter = await self._rate_limiter_getter()
-        key = await self._rate_limiter.wait_and_get_key()
-        headers = {"Authorization": f"Bearer {key}"}
+        headers = await self._auth_headers()
 
         response = await self.client.get("/agents/profile", params={"name": name}, headers=headers)
         response.raise_for_status()
@@ -135,10 +167,7 @@ class MoltbookClient:
         
         Returns matching posts, agents, and submolts.
         """
-        if self._rate_limiter is None:
-            self._rate_limiter = await self._rate_limiter_getter()
-        key = await self._rate_limiter.wait_and_get_key()
-        headers = {"Authorization": f"Bearer {key}"}
+        headers = await self._auth_headers()
 
         response = await self.client.get(
             "/search",
@@ -150,10 +179,7 @@ class MoltbookClient:
     
     async def get_my_profile(self) -> dict:
         """Get the observatory agent's own profile (for testing connection)."""
-        if self._rate_limiter is None:
-            self._rate_limiter = await self._rate_limiter_getter()
-        key = await self._rate_limiter.wait_and_get_key()
-        headers = {"Authorization": f"Bearer {key}"}
+        headers = await self._auth_headers()
 
         response = await self.client.get("/agents/me", headers=headers)
         response.raise_for_status()
@@ -168,7 +194,9 @@ async def get_client() -> MoltbookClient:
     """Get the global Moltbook client instance."""
     global _client
     if _client is None:
-        _client = MoltbookClient()
+        client = MoltbookClient()
+        await client.start()
+        _client = client
     return _client
 
 
@@ -1,208 +1,284 @@
-"""Process API responses into database records."""
+"""
+Process API responses into database records.
 
+Only the top-level process_* entry points commit, each inside
+write_transaction so transactions on the shared writer never interleave.
+The ensure_*_bulk helpers and process_agent_profiles leave their writes in
+the open transaction so a whole API response is written with a single
+commit; process_poll_cycle goes one step further and commits a whole poll
+cycle at once.
+"""
+
+import asyncio
+import logging
+import sqlite3
 from datetime import datetime
-from observatory.database.connection import get_db
+from observatory.database.connection import get_db, write_transaction
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lists under SQLite's default bound-variable limit
+MAX_IN_PARAMS = 500
+
+# Concurrent profile requests made by process_agents
+PROFILE_FETCH_CONCURRENCY = 16
+
+# Shape batches of at least this many posts or top-level comments in a
+# worker thread. Shaping costs ~2us per item, so a smaller batch blocks the
+# event loop for under ~1ms and the thread hop would only add latency
+SHAPE_IN_THREAD_MIN_ITEMS = 500
+
+# Batch statements, kept as constants so every call hands SQLite the
+# identical text and hits its prepared-statement cache
+_UPSERT_POST_SQL = """
+    INSERT INTO posts (id, agent_id, agent_name, submolt, title, content, url, score, comment_count, created_at, fetched_at, is_pinned)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        score = excluded.score,
+        comment_count = excluded.comment_count,
+        is_pinned = excluded.is_pinned
+"""
+
+_UPSERT_AGENT_SQL = """
+    INSERT INTO agents (id, name, description, karma, follower_count, following_count, is_claimed, first_seen_at, last_seen_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        description = COALESCE(?, description),
+        karma = COALESCE(?, karma),
+        follower_count = COALESCE(?, follower_count),
+        following_count = COALESCE(?, following_count),
+        is_claimed = COALESCE(?, is_claimed),
+        owner_x_handle = COALESCE(?, owner_x_handle),
+        avatar_url = COALESCE(?, avatar_url),
+        last_seen_at = excluded.last_seen_at
+"""
+
+_UPSERT_AGENT_PROFILE_SQL = """
+    INSERT INTO agents (id, name, description, karma, follower_count, following_count, is_claimed, owner_x_handle, first_seen_at, last_seen_at, created_at, avatar_url)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        description = excluded.description,
+        karma = excluded.karma,
+        follower_count = excluded.follower_count,
+        following_count = excluded.following_count,
+        is_claimed = excluded.is_claimed,
+        owner_x_handle = excluded.owner_x_handle,
+        last_seen_at = excluded.last_seen_at,
+        created_at = excluded.created_at,
+        avatar_url = excluded.avatar_url
+"""
+
+_UPSERT_SUBMOLT_SQL = """
+    INSERT INTO submolts (name, display_name, description, subscriber_count, post_count, created_at, first_seen_at, avatar_url, banner_url)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        display_name = COALESCE(?, display_name),
+        description = COALESCE(?, description),
+        subscriber_count = COALESCE(?, subscriber_count),
+        post_count = COALESCE(?, post_count),
+        avatar_url = COALESCE(?, avatar_url),
+        banner_url = COALESCE(?, banner_url)
+"""
+
+_INSERT_COMMENT_SQL = """
+    INSERT OR IGNORE INTO comments (id, post_id, agent_id, agent_name, parent_id, content, score, created_at, fetched_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+async def _existing_keys(db, table: str, column: str, keys) -> set:
+    """Return which of the given keys are already stored in table.column."""
+    keys = list(keys)
+    existing = set()
+    for i in range(0, len(keys), MAX_IN_PARAMS):
+        chunk = keys[i:i + MAX_IN_PARAMS]
+        placeholders = ",".join("?" * len(chunk))
+        async with db.execute(
+            f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", chunk
+        ) as cursor:
+            existing.update(row[0] for row in await cursor.fetchall())
+    return existing
+
+
+def _merge_into(mapping: dict, name: str, data: dict) -> None:
+    """
+    Record data under name, deduplicating within a batch. Later non-null
+    fields win, which leaves the same row that upserting every occurrence
+    in turn would have.
+    """
+    seen = mapping.get(name)
+    if seen is None:
+        mapping[name] = data
+    elif seen is not data:
+        mapping[name] = {**seen, **{k: v for k, v in data.items() if v is not None}}
+
+
+async def _upsert_agent_rows(db, sql: str, rows: list[tuple]) -> int:
+    """
+    Run an agent upsert for every row with one executemany. One bad row
+    (e.g. an id already stored under another name) must not sink the
+    batch: if it fails, undo it and write the rows one at a time, logging
+    and skipping the ones SQLite rejects. Each row carries the agent name
+    second. Returns number of rows stored.
+    """
+    await db.execute("SAVEPOINT agents")
+    try:
+        await db.executemany(sql, rows)
+    except sqlite3.Error:
+        await db.execute("ROLLBACK TO agents")
+    else:
+        await db.execute("RELEASE agents")
+        return len(rows)
+    
+    stored = 0
+    for row in rows:
+        try:
+            await db.execute(sql, row)
+            stored += 1
+        except sqlite3.Error:
+            logger.warning("Error storing agent %s", row[1], exc_info=True)
+    await db.execute("RELEASE agents")
+    return stored
+
+
+def _shape_post_rows(posts: list[dict], now: str) -> tuple[list, dict, dict]:
+    """
+    Turn API posts into upsert rows plus the deduplicated authors and
+    submolts they reference. Pure and synchronous, so it can run in a
+    worker thread.
+    """
+    posts = [post for post in posts if post.get("id")]
+    
+    # Score is upvotes minus downvotes; author and submolt come from the
+    # embedded objects
+    rows = [
+        (
+            post["id"],
+            (author := post.get("author") or {}).get("id"),
+            author.get("name", ""),
+            (post.get("submolt") or {}).get("name", ""),
+            post.get("title", ""),
+            post.get("content", ""),
+            post.get("url"),
+            (post.get("upvotes") or 0) - (post.get("downvotes") or 0),
+            post.get("comment_count") or 0,
+            post.get("created_at"),
+            now,
+            int(bool(post.get("is_pinned"))),
+        )
+        for post in posts
+    ]
+    
+    agent_map: dict[str, dict] = {}
+    submolt_map: dict[str, dict] = {}
+    for post in posts:
+        submolt_data = post.get("submolt") or {}
+        if submolt_name := submolt_data.get("name"):
+            _merge_into(submolt_map, submolt_name, submolt_data)
+        author = post.get("author") or {}
+        if author_name := author.get("name"):
+            _merge_into(agent_map, author_name, author)
+    
+    return rows, agent_map, submolt_map
 
 
-async def process_posts(posts_data: dict) -> int:
+async def process_posts(posts_data: dict, autocommit: bool = True) -> int:
     """
     Process posts from API response and store in database.
     Also extracts and updates agent/submolt data from post metadata.
     
+    With autocommit=False the caller owns the transaction.
     Returns number of new posts inserted.
     """
-    db = await get_db()
     posts = posts_data.get("posts", [])
     if not posts:
         return 0
+    if autocommit:
+        async with write_transaction():
+            return await process_posts(posts_data, autocommit=False)
     
-    new_count = 0
-    now = datetime.utcnow().isoformat()
-    
-    for post in posts:
-        post_id = post.get("id")
-        if not post_id:
-            continue
-        
-        # Calculate score from upvotes/downvotes
-        upvotes = post.get("upvotes", 0) or 0
-        downvotes = post.get("downvotes", 0) or 0
-        score = upvotes - downvotes
-        
-        # Check if post exists
-        async with db.execute("SELECT id FROM posts WHERE id = ?", (post_id,)) as cursor:
-            exists = await cursor.fetchone()
-        
-        if exists:
-            # Update existing post (score might have changed)
-            await db.execute("""
-                UPDATE posts SET
-                    score = ?,
-                    comment_count = ?,
-                    is_pinned = ?
-                WHERE id = ?
-            """, (
-                score,
-                post.get("comment_count", 0) or 0,
-                post.get("is_pinned", False),
-                post_id,
-            ))
-        else:
-            # Get author info
-            author = post.get("author") or {}
-            author_name = author.get("name", "")
-            
-            # Handle submolt data
-            submolt_data = post.get("submolt") or {}
-            submolt_name = submolt_data.get("name", "")
-            if submolt_name:
-                await ensure_submolt(submolt_name, submolt_data)
-            
-            # Ensure agent exists BEFORE inserting post (for foreign key constraint)
-            if author_name:
-                await ensure_agent(author_name, author if isinstance(author, dict) else None)
-            
-            await db.execute("""
-                INSERT INTO posts (id, agent_id, agent_name, submolt, title, content, url, score, comment_count, created_at, fetched_at, is_pinned)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                post_id,
-                author.get("id"),
-                author_name,
-                submolt_name,
-                post.get("title", ""),
-                post.get("content", ""),
-                post.get("url"),
-                score,
-                post.get("comment_count", 0),
-                post.get("created_at"),
-                now,
-                False,
-            ))
-            new_count += 1
-    
-    await db.commit()
-    return new_count
-
-
-async def ensure_agent(name: str, agent_data: dict = None) -> None:
-    """Ensure an agent exists in the database and update with latest available data."""
     db = await get_db()
     
-    async with db.execute("SELECT name FROM agents WHERE name = ?", (name,)) as cursor:
-        exists = await cursor.fetchone()
-    
     now = datetime.utcnow().isoformat()
-    
-    if exists:
-        # Update existing agent with fresh data
-        if agent_data:
-            owner = agent_data.get("owner", {})
-            await db.execute("""
-                UPDATE agents SET
-                    description = ?,
-                    karma = ?,
-                    follower_count = ?,
-                    following_count = ?,
-                    is_claimed = ?,
-                    owner_x_handle = ?,
-                    avatar_url = ?,
-                    last_seen_at = ?
-                WHERE name = ?
-            """, (
-                agent_data.get("description", ""),
-                agent_data.get("karma", 0),
-                agent_data.get("follower_count", 0),
-                agent_data.get("following_count", 0),
-                agent_data.get("is_claimed", False),
-                owner.get("x_handle"),
-                agent_data.get("avatar_url"),
-                now,
-                name,
-            ))
-        else:
-            # Just update last_seen
-            await db.execute("UPDATE agents SET last_seen_at = ? WHERE name = ?", (now, name))
+    # Shaping is pure CPU work; keep large batches off the event loop
+    if len(posts) >= SHAPE_IN_THREAD_MIN_ITEMS:
+        rows, agent_map, submolt_map = await asyncio.to_thread(_shape_post_rows, posts, now)
     else:
-        # Insert new agent
-        if agent_data:
-            await db.execute("""
-                INSERT INTO agents (id, name, description, karma, follower_count, following_count, is_claimed, first_seen_at, last_seen_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                agent_data.get("id"),
-                name,
-                agent_data.get("description", ""),
-                agent_data.get("karma", 0),
-                agent_data.get("follower_count", 0),
-                agent_data.get("following_count", 0),
-                agent_data.get("is_claimed", False),
-                now,
-                now,
-            ))
-        else:
-            # Minimal agent record
-            await db.execute("""
-                INSERT INTO agents (id, name, first_seen_at, last_seen_at)
-                VALUES (?, ?, ?, ?)
-            """, (
-                name,
-                name,
-                now,
-                now,
-            ))
-    
-    await db.commit()
-
-
-async def process_agent_profile(profile_data: dict) -> None:
-    """Process and store agent profile data."""
-    db = await get_db()
+        rows, agent_map, submolt_map = _shape_post_rows(posts, now)
+    if not rows:
+        return 0
     
-    agent = profile_data.get("agent", {})
-    if not agent:
-        return
+    # Ensure agents exist BEFORE inserting posts (for foreign key constraint)
+    await ensure_submolts_bulk(list(submolt_map.values()), now)
+    await ensure_agents_bulk(list(agent_map.values()), now)
+    
+    # executemany can't hand back per-row results, so count new posts by
+    # looking up which ids are already stored (chunked to stay under
+    # SQLite's bound-variable limit)
+    ids = {row[0] for row in rows}
+    existing = await _existing_keys(db, "posts", "id", ids)
     
-    name = agent.get("name")
-    if not name:
+    # Insert new posts; for existing ones refresh the fields that change
+    # (score, comment count, pinned)
+    await db.executemany(_UPSERT_POST_SQL, rows)
+    return len(ids) - len(existing)
+
+
+async def ensure_agents_bulk(agent_dicts: list[dict], now: str = None) -> None:
+    """
+    Upsert many agents (author objects, each carrying at least a name) in
+    one executemany. New agents get defaults for missing fields; existing
+    ones keep stored values for anything the payload leaves out. Does not
+    commit.
+    """
+    if not agent_dicts:
         return
     
-    now = datetime.utcnow().isoformat()
-    owner = agent.get("owner", {})
-    
-    async with db.execute("SELECT name FROM agents WHERE name = ?", (name,)) as cursor:
-        exists = await cursor.fetchone()
-    
-    if exists:
-        await db.execute("""
-            UPDATE agents SET
-                description = ?,
-                karma = ?,
-                follower_count = ?,
-                following_count = ?,
-                is_claimed = ?,
-                owner_x_handle = ?,
-                last_seen_at = ?,
-                created_at = ?,
-                avatar_url = ?
-            WHERE name = ?
-        """, (
+    db = await get_db()
+    now = now or datetime.utcnow().isoformat()
+    rows = []
+    for agent in agent_dicts:
+        owner = agent.get("owner") or {}
+        rows.append((
+            # Insert values
+            agent.get("id"),
+            agent["name"],
             agent.get("description", ""),
             agent.get("karma", 0),
             agent.get("follower_count", 0),
             agent.get("following_count", 0),
             agent.get("is_claimed", False),
-            owner.get("x_handle") if owner else None,
             now,
-            agent.get("created_at"),
+            now,
+            # Update values (None keeps the stored column)
+            agent.get("description"),
+            agent.get("karma"),
+            agent.get("follower_count"),
+            agent.get("following_count"),
+            agent.get("is_claimed"),
+            owner.get("x_handle"),
             agent.get("avatar_url"),
-            name,
         ))
-    else:
-        await db.execute("""
-            INSERT INTO agents (id, name, description, karma, follower_count, following_count, is_claimed, owner_x_handle, first_seen_at, last_seen_at, created_at, avatar_url)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    
+    await _upsert_agent_rows(db, _UPSERT_AGENT_SQL, rows)
+
+
+async def process_agent_profiles(profiles: list[dict], now: str = None) -> int:
+    """
+    Store many agent profile responses with one executemany.
+    Does not commit.
+    
+    Returns number of profiles stored.
+    """
+    now = now or datetime.utcnow().isoformat()
+    rows = []
+    for profile_data in profiles:
+        agent = profile_data.get("agent", {})
+        name = agent.get("name") if agent else None
+        if not name:
+            continue
+        owner = agent.get("owner", {})
+        rows.append((
             agent.get("id", name),
             name,
             agent.get("description", ""),
@@ -216,8 +292,13 @@ async def process_agent_profile(profile_data: dict) -> None:
             agent.get("created_at"),
             agent.get("avatar_url"),
         ))
+    if not rows:
+        return 0
     
-    await db.commit()
+    # A profile is the full record, so existing agents take every field
+    # except id and first_seen_at
+    db = await get_db()
+    return await _upsert_agent_rows(db, _UPSERT_AGENT_PROFILE_SQL, rows)
 
 
 async def process_agents(agents_list: list[str]) -> int:
@@ -229,162 +310,195 @@ async def process_agents(agents_list: list[str]) -> int:
     from observatory.poller.client import get_client
     
     client = await get_client()
-    updated = 0
+    now = datetime.utcnow().isoformat()
+    semaphore = asyncio.Semaphore(PROFILE_FETCH_CONCURRENCY)
     
-    for name in agents_list:
-        try:
-            profile = await client.get_agent_profile(name)
-            await process_agent_profile(profile)
-            updated += 1
-        except Exception as e:
-            print(f"Error fetching profile for {name}: {e}")
+    async def fetch(name: str) -> dict:
+        async with semaphore:
+            return await client.get_agent_profile(name)
     
-    return updated
-
-
-async def ensure_submolt(name: str, submolt_data: dict = None) -> None:
-    """Ensure a submolt exists in the database and update with latest available data."""
-    db = await get_db()
+    results = await asyncio.gather(
+        *(fetch(name) for name in agents_list), return_exceptions=True
+    )
     
-    async with db.execute("SELECT name FROM submolts WHERE name = ?", (name,)) as cursor:
-        exists = await cursor.fetchone()
+    profiles = []
+    for name, result in zip(agents_list, results):
+        if isinstance(result, BaseException):
+            logger.warning("Error fetching profile for %s", name, exc_info=result)
+        else:
+            profiles.append(result)
     
-    now = datetime.utcnow().isoformat()
+    async with write_transaction():
+        return await process_agent_profiles(profiles, now)
+
+
+async def ensure_submolts_bulk(submolt_dicts: list[dict], now: str = None) -> None:
+    """
+    Upsert many submolts (each carrying at least a name) in one executemany.
+    New submolts get defaults for missing fields; existing ones keep stored
+    values for anything the payload leaves out. Does not commit.
+    """
+    if not submolt_dicts:
+        return
     
-    if exists:
-        # Update existing submolt with fresh data if available
-        if submolt_data:
-            subscriber_count = (
-                submolt_data.get("subscriber_count")
-                if "subscriber_count" in submolt_data
-                else None
-            )
-            post_count = (
-                submolt_data.get("post_count")
-                if "post_count" in submolt_data
-                else None
-            )
-            await db.execute("""
-                UPDATE submolts SET
-                    display_name = ?,
-                    description = ?,
-                    subscriber_count = COALESCE(?, subscriber_count),
-                    post_count = COALESCE(?, post_count),
-                    avatar_url = ?,
-                    banner_url = ?
-                WHERE name = ?
-            """, (
-                submolt_data.get("display_name", name),
-                submolt_data.get("description", ""),
-                subscriber_count,
-                post_count,
-                submolt_data.get("avatar_url"),
-                submolt_data.get("banner_url"),
-                name,
-            ))
-    else:
-        # Insert new submolt
-        await db.execute("""
-            INSERT INTO submolts (name, display_name, description, subscriber_count, post_count, created_at, first_seen_at, avatar_url, banner_url)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    db = await get_db()
+    now = now or datetime.utcnow().isoformat()
+    rows = []
+    for submolt in submolt_dicts:
+        name = submolt["name"]
+        rows.append((
+            # Insert values
             name,
-            submolt_data.get("display_name", name) if submolt_data else name,
-            submolt_data.get("description", "") if submolt_data else "",
-            submolt_data.get("subscriber_count", 0) if submolt_data else 0,
+            submolt.get("display_name", name),
+            submolt.get("description", ""),
+            submolt.get("subscriber_count", 0),
             0,  # Will be calculated from posts
-            submolt_data.get("created_at") if submolt_data else now,
+            submolt.get("created_at"),
             now,
-            submolt_data.get("avatar_url") if submolt_data else None,
-            submolt_data.get("banner_url") if submolt_data else None,
+            submolt.get("avatar_url"),
+            submolt.get("banner_url"),
+            # Update values (None keeps the stored column)
+            submolt.get("display_name"),
+            submolt.get("description"),
+            submolt.get("subscriber_count"),
+            submolt.get("post_count"),
+            submolt.get("avatar_url"),
+            submolt.get("banner_url"),
         ))
     
-    await db.commit()
+    await db.executemany(_UPSERT_SUBMOLT_SQL, rows)
 
 
-async def process_submolts(submolts_data: dict) -> int:
+async def process_submolts(submolts_data: dict, autocommit: bool = True) -> int:
     """
     Process submolts from API response and store in database.
     
+    With autocommit=False the caller owns the transaction.
     Returns number of submolts processed.
     """
-    db = await get_db()
     submolts = submolts_data.get("submolts", [])
     if not submolts:
         return 0
+    if autocommit:
+        async with write_transaction():
+            return await process_submolts(submolts_data, autocommit=False)
     
-    count = 0
-    
-    for submolt in submolts:
-        name = submolt.get("name")
-        if not name:
+    named = [submolt for submolt in submolts if submolt.get("name")]
+    await ensure_submolts_bulk(named, datetime.utcnow().isoformat())
+    return len(named)
+
+
+def _flatten_comments(comments: list):
+    """
+    Walk a comment tree depth-first, yielding (comment, parent_id) in the
+    same pre-order as the API nests them. Comments without an id are
+    skipped along with their replies.
+    """
+    stack = [(comment, None) for comment in reversed(comments)]
+    while stack:
+        comment, parent_id = stack.pop()
+        comment_id = comment.get("id")
+        if not comment_id:
             continue
-        
-        await ensure_submolt(name, submolt)
-        count += 1
+        yield comment, parent_id
+        stack.extend((reply, comment_id) for reply in reversed(comment.get("replies") or []))
+
+
+def _shape_comment_rows(post_id: str, comments: list, now: str) -> tuple[list, dict]:
+    """
+    Flatten a comment thread into insert rows plus the deduplicated
+    authors it references. Pure and synchronous, so it can run in a
+    worker thread.
+    """
+    flat = list(_flatten_comments(comments))
+    
+    # API returns an author object; score is upvotes minus downvotes
+    rows = [
+        (
+            comment["id"],
+            post_id,
+            (author := comment.get("author") or {}).get("id"),
+            author.get("name", ""),
+            parent_id,
+            comment.get("content", ""),
+            (comment.get("upvotes") or 0) - (comment.get("downvotes") or 0),
+            comment.get("created_at"),
+            now,
+        )
+        for comment, parent_id in flat
+    ]
+    
+    agent_map: dict[str, dict] = {}
+    for comment, _ in flat:
+        author = comment.get("author") or {}
+        if author_name := author.get("name"):
+            _merge_into(agent_map, author_name, author)
     
-    return count
+    return rows, agent_map
 
 
-async def process_comments(post_id: str, comments: list) -> int:
+async def process_comments(post_id: str, comments: list, autocommit: bool = True) -> int:
     """
     Process comments from API response and store in database.
     
+    With autocommit=False the caller owns the transaction.
     Returns number of new comments inserted.
     """
-    db = await get_db()
     if not comments:
         return 0
+    if autocommit:
+        async with write_transaction():
+            return await process_comments(post_id, comments, autocommit=False)
     
-    new_count = 0
+    db = await get_db()
     now = datetime.utcnow().isoformat()
+    # Flattening and shaping are pure CPU work; keep large threads off the
+    # event loop
+    if len(comments) >= SHAPE_IN_THREAD_MIN_ITEMS:
+        rows, agent_map = await asyncio.to_thread(_shape_comment_rows, post_id, comments, now)
+    else:
+        rows, agent_map = _shape_comment_rows(post_id, comments, now)
+    if not rows:
+        return 0
     
-    async def process_comment(comment: dict, parent_id: str = None) -> None:
-        nonlocal new_count
-        
-        comment_id = comment.get("id")
-        if not comment_id:
-            return
-        
-        async with db.execute("SELECT id FROM comments WHERE id = ?", (comment_id,)) as cursor:
-            exists = await cursor.fetchone()
-        
-        # API returns author object
-        author = comment.get("author") or {}
-        author_name = author.get("name", "")
-        
-        # Calculate score from upvotes/downvotes
-        upvotes = comment.get("upvotes", 0) or 0
-        downvotes = comment.get("downvotes", 0) or 0
-        score = upvotes - downvotes
-        
-        if not exists:
-            # Ensure agent exists BEFORE inserting comment (FK constraint)
-            if author_name:
-                await ensure_agent(author_name, author)
-            
-            await db.execute("""
-                INSERT INTO comments (id, post_id, agent_id, agent_name, parent_id, content, score, created_at, fetched_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                comment_id,
-                post_id,
-                author.get("id"),
-                author_name,
-                parent_id,
-                comment.get("content", ""),
-                score,
-                comment.get("created_at"),
-                now,
-            ))
-            new_count += 1
-        
-        # Process replies
-        for reply in comment.get("replies", []):
-            await process_comment(reply, comment_id)
-    
-    for comment in comments:
-        await process_comment(comment)
-    
-    await db.commit()
-    return new_count
+    # Agents upsert first so the comment FKs resolve; both batches share
+    # one transaction with no commit in between
+    await ensure_agents_bulk(list(agent_map.values()), now)
+    
+    # Comments are never updated once stored; rowcount sums the rows the
+    # batch actually inserted
+    cursor = await db.executemany(_INSERT_COMMENT_SQL, rows)
+    return cursor.rowcount
+
+
+async def process_poll_cycle(
+    posts_data: dict = None,
+    submolts_data: dict = None,
+    comments_map: dict[str, list] = None,
+) -> dict:
+    """
+    Store everything fetched in one poll cycle inside a single transaction.
+    
+    comments_map maps post id to that post's comment list. Submolts are
+    written first and comments last so foreign keys resolve in order. A
+    thread that fails to store is logged and skipped; any other failure
+    rolls back the whole cycle.
+    Returns counts keyed by "submolts", "posts" and "comments".
+    """
+    counts = {"submolts": 0, "posts": 0, "comments": 0}
+    async with write_transaction() as db:
+        if submolts_data:
+            counts["submolts"] = await process_submolts(submolts_data, autocommit=False)
+        if posts_data:
+            counts["posts"] = await process_posts(posts_data, autocommit=False)
+        for post_id, comments in (comments_map or {}).items():
+            # A savepoint per thread, so one bad thread is skipped instead
+            # of rolling back the whole cycle
+            await db.execute("SAVEPOINT thread")
+            try:
+                counts["comments"] += await process_comments(post_id, comments, autocommit=False)
+            except Exception:
+                await db.execute("ROLLBACK TO thread")
+                logger.warning("Skipping comments for post %s", post_id, exc_info=True)
+            await db.execute("RELEASE thread")
+    return counts
@@ -4,28 +4,36 @@ import asyncio
 from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from observatory.cache import get_cache
 from observatory.config import config
 
 
 async def poll_posts() -> None:
     """Fetch new posts from Moltbook."""
     from observatory.poller.client import get_client
-    from observatory.poller.processors import process_posts
+    from observatory.poller.processors import process_poll_cycle
     
     try:
         client = await get_client()
         
-        # Fetch newest posts
-        data = await client.get_posts(sort="new", limit=50)
-        new_count = await process_posts(data)
+        # Fetch newest posts, plus hot posts to catch trending content
+        new = await client.get_posts(sort="new", limit=50)
+        posts = new.get("posts", [])
+        
+        # A failed hot fetch must not throw away the new feed
+        try:
+            hot = await client.get_posts(sort="hot", limit=25)
+            posts += hot.get("posts", [])
+        except Exception as e:
+            print(f"[{datetime.now().isoformat()}] Error fetching hot posts: {e}")
+        
+        # Store both feeds in one transaction
+        counts = await process_poll_cycle(posts_data={"posts": posts})
+        new_count = counts["posts"]
         
         if new_count > 0:
             print(f"[{datetime.now().isoformat()}] Fetched {new_count} new posts")
         
-        # Also fetch hot posts to catch trending content
-        data = await client.get_posts(sort="hot", limit=25)
-        await process_posts(data)
-        
     except Exception as e:
         print(f"[{datetime.now().isoformat()}] Error polling posts: {e}")
 
@@ -73,12 +81,12 @@ async def poll_submolts() -> None:
 
 async def poll_agents() -> None:
     """Update agent profiles for known agents."""
-    from observatory.database.connection import execute_query
+    from observatory.database.connection import execute_query_rows
     from observatory.poller.processors import process_agents
     
     try:
         # Get agents we haven't updated recently
-        agents = await execute_query("""
+        agents = await execute_query_rows("""
             SELECT name FROM agents
             ORDER BY last_seen_at ASC
             LIMIT 20
@@ -94,9 +102,9 @@ async def poll_agents() -> None:
 
 async def poll_comments() -> None:
     """Fetch comments for posts that have comments."""
-    from observatory.database.connection import execute_query
+    from observatory.database.connection import execute_query_rows
     from observatory.poller.client import get_client
-    from observatory.poller.processors import process_comments
+    from observatory.poller.processors import process_poll_cycle
     
     try:
         # Get posts with comments that we haven't fetched comments for yet
@@ -104,7 +112,7 @@ async def poll_comments() -> None:
         # So we consider posts with 900+ stored comments as "complete"
         API_COMMENT_LIMIT = 900  # Slightly below 998 to account for edge cases
         
-        posts = await execute_query("""
+        posts = await execute_query_rows("""
             SELECT p.id, p.comment_count 
             FROM posts p
             LEFT JOIN (
@@ -125,7 +133,7 @@ async def poll_comments() -> None:
             return
             
         client = await get_client()
-        total_new = 0
+        comments_map = {}
         
         for post in posts:
             try:
@@ -134,10 +142,13 @@ async def poll_comments() -> None:
                 comments = response.get("comments", [])
                 
                 if comments:
-                    new_count = await process_comments(post["id"], comments)
-                    total_new += new_count
+                    comments_map[post["id"]] = comments
             except Exception as e:
                 print(f"[{datetime.now().isoformat()}] Error fetching comments for post {post['id']}: {e}")
+        
+        # Store every fetched thread in one transaction
+        counts = await process_poll_cycle(comments_map=comments_map)
+        total_new = counts["comments"]
                 
         if total_new > 0:
             print(f"[{datetime.now().isoformat()}] Fetched {total_new} new comments")
@@ -167,6 +178,13 @@ async def take_snapshot() -> None:
         print(f"[{datetime.now().isoformat()}] Error taking snapshot: {e}")
 
 
+async def sweep_cache() -> None:
+    """Evict expired response cache entries."""
+    # A coroutine so APScheduler runs it on the event loop; a plain function
+    # would go to a worker thread and race the handlers using the cache
+    get_cache().sweep_expired()
+
+
 def setup_scheduler() -> AsyncIOScheduler:
     """Set up and return the background scheduler."""
     scheduler = AsyncIOScheduler()
@@ -225,6 +243,15 @@ def setup_scheduler() -> AsyncIOScheduler:
         replace_existing=True,
     )
     
+    # Evict expired response cache entries every 5 minutes
+    scheduler.add_job(
+        sweep_cache,
+        IntervalTrigger(minutes=5),
+        id="sweep_cache",
+        name="Sweep expired cache entries",
+        replace_existing=True,
+    )
+    
     return scheduler
 
 
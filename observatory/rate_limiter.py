@@ -1,15 +1,43 @@
-"""Rate limiter for API calls with support for per-key rotation."""
+"""
+Rate limiter for API calls with support for per-key rotation.
+
+Limiters are not thread-safe and take no locks: each one belongs to a
+single event loop, and every check-then-update runs with no await in
+between, so no other coroutine can interleave with it.
+"""
 
 import asyncio
-from time import time
-from collections import deque
+import heapq
+import itertools
+import logging
+from array import array
+from time import monotonic as time
 from typing import List, Dict, Optional
 from observatory.config import config
 
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between repeated "waiting" log messages from one limiter
+LOG_INTERVAL = 1.0
+
+
+def _should_log(limiter, now: float) -> bool:
+    """Return whether limiter may log again now, noting the time if so."""
+    if now - limiter._last_log < LOG_INTERVAL:
+        return False
+    limiter._last_log = now
+    return True
+
 
 class RateLimiter:
     """Token bucket rate limiter for API calls (single key)."""
     
+    def __new__(cls, calls_per_minute: int):
+        # A one-call window is just the last call's timestamp
+        if cls is RateLimiter and calls_per_minute == 1:
+            cls = RateLimiter1
+        return super().__new__(cls)
+    
     def __init__(self, calls_per_minute: int):
         """
         Initialize the rate limiter.
@@ -19,47 +47,130 @@ class RateLimiter:
         """
         self.calls_per_minute = calls_per_minute
         self.min_interval = 60.0 / calls_per_minute  # Seconds between calls
-        self.call_times: deque = deque()
-        self._lock = asyncio.Lock()
+        # Call timestamps live in a preallocated ring: _head is the oldest
+        # slot in use and _count how many slots are in use. The window never
+        # holds more than calls_per_minute calls, so it never grows.
+        self._ring = array("d", [0.0]) * calls_per_minute
+        self._head = 0
+        self._count = 0
+        self._last_log = float("-inf")
+        # Set when the oldest call leaves a full window. One timer per
+        # bucket wakes every waiter instead of each polling with its own sleep
+        self._slot_free = asyncio.Event()
+        self._wakeup: asyncio.Future | None = None
+    
+    @property
+    def call_times(self) -> list[float]:
+        """Timestamps of the calls in the current window, oldest first."""
+        ring, head, size = self._ring, self._head, self.calls_per_minute
+        return [ring[(head + i) % size] for i in range(self._count)]
+    
+    def _prune(self, now: float) -> None:
+        """Remove calls older than or exactly 60 seconds ago."""
+        cutoff = now - 60.0
+        # Work on locals and write the indices back once
+        ring, size = self._ring, self.calls_per_minute
+        head, count = self._head, self._count
+        while count and ring[head] <= cutoff:
+            head += 1
+            if head == size:
+                head = 0
+            count -= 1
+        self._head, self._count = head, count
+    
+    def _record(self, now: float) -> None:
+        """Record a call; callers check there is room first."""
+        self._ring[(self._head + self._count) % self.calls_per_minute] = now
+        self._count += 1
+    
+    def _earliest_expiry(self, now: float) -> float:
+        """
+        Seconds until a slot frees up, or 0 if one is free now.
+        
+        Only an estimate for how long to sleep: a stale answer just means
+        waking early and retrying.
+        """
+        if self._count >= self.calls_per_minute:
+            return 60 - (now - self._ring[self._head])
+        return 0
+    
+    async def _wake_after(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._slot_free.set()
+    
+    async def wait_for_slot(self, delay: float) -> None:
+        """
+        Wait until a slot is expected to free up, delay seconds from now.
+        
+        Concurrent waiters share the bucket's pending timer. Waking is only a
+        hint: callers re-check the window and wait again if they lose the race.
+        """
+        if self._wakeup is None or self._wakeup.done():
+            self._slot_free.clear()
+            self._wakeup = asyncio.ensure_future(self._wake_after(delay))
+        await self._slot_free.wait()
     
     async def wait_if_needed(self) -> None:
         """
         Wait if necessary to maintain rate limit.
+        
+        The window is re-checked on every wake, since another caller may
+        have claimed the slot first.
         """
-        async with self._lock:
+        # Common case: a slot is plainly free
+        if self._fast_try_acquire(time()):
+            return
+        
+        while True:
             now = time()
             
-            # Remove calls older than or exactly 60 seconds ago
-            while self.call_times and self.call_times[0] <= now - 60:
-                self.call_times.popleft()
+            self._prune(now)
             
-            # If we've hit the limit, wait until the oldest call drops out of the window
-            if len(self.call_times) >= self.calls_per_minute:
-                sleep_time = 60 - (now - self.call_times[0])
-                if sleep_time > 0:
-                    print(f"Rate limit reached. Waiting {sleep_time:.2f}s before next API call...")
-                    await asyncio.sleep(sleep_time)
+            # Record this call if the window has room
+            if self._count < self.calls_per_minute:
+                self._record(now)
+                return
             
-            # Record this call
-            self.call_times.append(time())
+            # Otherwise wait until the oldest call drops out of the window
+            sleep_time = self._earliest_expiry(now)
+            if _should_log(self, now):
+                logger.warning("Rate limit reached. Waiting %.2fs before next API call...", sleep_time)
+            
+            # Other callers can re-check the window (and claim slots that free
+            # up) meanwhile; then re-check ourselves
+            await self.wait_for_slot(sleep_time)
 
-    async def try_acquire_now(self) -> bool:
+    def _fast_try_acquire(self, now: float) -> bool:
+        """
+        Claim a slot when one is plainly free, skipping the full prune
+        and recheck that a full window needs.
+        """
+        cutoff = now - 60.0
+        if self._count < self.calls_per_minute or self._ring[self._head] <= cutoff:
+            self._prune(now)
+            self._record(now)
+            return True
+        return False
+
+    def try_acquire_now(self, now: Optional[float] = None) -> bool:
         """Try to acquire a slot now without waiting. Return True if acquired."""
-        async with self._lock:
+        if now is None:
             now = time()
-            while self.call_times and self.call_times[0] <= now - 60:
-                self.call_times.popleft()
-            if len(self.call_times) < self.calls_per_minute:
-                self.call_times.append(now)
-                return True
-            return False
+        if self._fast_try_acquire(now):
+            return True
+        self._prune(now)
+        if self._count < self.calls_per_minute:
+            self._record(now)
+            return True
+        return False
 
     def get_usage(self, now: Optional[float] = None) -> tuple[int, int]:
         """Return (used, available) counts in the current 60s window."""
         if now is None:
             now = time()
-        # count timestamps strictly newer than now - 60 (we prune <= now-60 elsewhere)
-        used = sum(1 for t in self.call_times if t > now - 60)
+        # After pruning, everything left is inside the window
+        self._prune(now)
+        used = self._count
         available = max(0, self.calls_per_minute - used)
         return used, available
 
@@ -69,74 +180,109 @@ class RateLimiter:
         return {"used": used, "available": available, "limit": self.calls_per_minute}
 
 
+class RateLimiter1(RateLimiter):
+    """RateLimiter specialised for calls_per_minute == 1: the window is one float."""
+    
+    def __init__(self, calls_per_minute: int = 1):
+        super().__init__(1)
+        self._last = float("-inf")
+    
+    @property
+    def call_times(self) -> list[float]:
+        """Timestamps of the calls in the current window, oldest first."""
+        return [self._last] if self._count else []
+    
+    def _prune(self, now: float) -> None:
+        if self._count and self._last <= now - 60.0:
+            self._count = 0
+    
+    def _record(self, now: float) -> None:
+        self._last = now
+        self._count = 1
+    
+    def _earliest_expiry(self, now: float) -> float:
+        return 60 - (now - self._last) if self._count else 0
+    
+    def _fast_try_acquire(self, now: float) -> bool:
+        if self._last <= now - 60.0:
+            self._last = now
+            self._count = 1
+            return True
+        return False
+
+
 class KeyedRateLimiter:
     """Rate limiter that rotates among multiple API keys.
 
     Each key has its own RateLimiter (with the same calls_per_minute limit).
-    The limiter will try to pick a key that can be used immediately; if none
-    are available it sleeps the minimal required time across keys.
+    Keys sit in a heap ordered by when they can next be used, so picking one
+    is O(log n); if none is free it waits for the key that frees up first.
     """
 
     def __init__(self, keys: List[str], calls_per_minute: int):
         if not keys:
             raise ValueError("At least one API key is required")
+        # A key listed twice is still one quota, so it gets one bucket
+        keys = list(dict.fromkeys(keys))
         self.keys = keys
-        self._limiters: Dict[str, RateLimiter] = {k: RateLimiter(calls_per_minute) for k in keys}
-        self._idx = 0
-        self._lock = asyncio.Lock()
+        # Buckets are index-aligned with keys so the hot scans walk a list
+        # instead of hashing key strings; _limiters maps names for status
+        self._buckets: List[RateLimiter] = [RateLimiter(calls_per_minute) for _ in keys]
+        self._limiters: Dict[str, RateLimiter] = dict(zip(keys, self._buckets))
+        # Min-heap of (ready_at, seq, index): the head is always the key that
+        # can be used soonest. seq breaks ties first-in-first-out, which keeps
+        # rotating through keys that are all free.
+        self._heap = [(0.0, i, i) for i in range(len(keys))]
+        self._next_seq = itertools.count(len(keys)).__next__
+        self._last_log = float("-inf")
         self.calls_per_minute = calls_per_minute
 
     async def wait_and_get_key(self) -> str:
         """Wait if needed and return an API key that can be used for the next call."""
-        n = len(self.keys)
+        heap = self._heap
         while True:
-            async with self._lock:
-                now = time()
-                # Try to find a key that can be acquired immediately
-                for i in range(n):
-                    idx = (self._idx + i) % n
-                    key = self.keys[idx]
-                    limiter = self._limiters[key]
-                    if await limiter.try_acquire_now():
-                        # move pointer forward for next rotation
-                        self._idx = (idx + 1) % n
-                        return key
-
-                # None available immediately - compute minimal sleep needed across keys
-                min_sleep = None
-                for key in self.keys:
-                    limiter = self._limiters[key]
-                    async with limiter._lock:
-                        if not limiter.call_times:
-                            wait = 0
-                        else:
-                            wait = 60 - (now - limiter.call_times[0]) if len(limiter.call_times) >= limiter.calls_per_minute else 0
-                        if wait > 0 and (min_sleep is None or wait < min_sleep):
-                            min_sleep = wait
-
-                # compute aggregate status for nicer logging
+            now = time()
+            ready_at, _, idx = heap[0]
+            limiter = self._buckets[idx]
+            acquired = ready_at <= now and limiter.try_acquire_now(now)
+            if acquired or ready_at <= now:
+                # Re-file the key under when it can next be used (also
+                # corrects an entry that turned out to be stale)
+                ready = now + limiter._earliest_expiry(now)
+                heapq.heapreplace(heap, (ready, self._next_seq(), idx))
+            if acquired:
+                return self.keys[idx]
+            if ready_at <= now:
+                continue
+            
+            # Nothing is free: the head is the key whose slot frees up first
+            min_sleep = ready_at - now
+            # The aggregate status is only for the log line, so skip building
+            # it while the log is throttled
+            if _should_log(self, now):
                 total_used = 0
-                total_capacity = self.calls_per_minute * len(self.keys)
                 total_available = 0
-                for key in self.keys:
-                    used, available = self._limiters[key].get_usage(now)
+                for bucket in self._buckets:
+                    used, available = bucket.get_usage(now)
                     total_used += used
                     total_available += available
-                status = {"total_used": total_used, "capacity": total_capacity, "total_available": total_available}
-                # If for some reason min_sleep is None (shouldn't happen), default to small sleep
-                if min_sleep is None:
-                    min_sleep = 0.1
-                print(f"All keys exhausted. Waiting {min_sleep:.2f}s before retrying... total_used={status['total_used']}/{status['capacity']}, total_available={status['total_available']}")
-            await asyncio.sleep(min_sleep)
+                logger.warning(
+                    "All keys exhausted. Waiting %.2fs before retrying... total_used=%d/%d, total_available=%d",
+                    min_sleep, total_used, self.calls_per_minute * len(self.keys), total_available,
+                )
+            await limiter.wait_for_slot(min_sleep)
 
     def status(self, now: Optional[float] = None) -> dict:
         """Return status for all keys: total_used, total_available, capacity, and per-key breakdown."""
         if now is None:
             now = time()
-        per_key = {k: self._limiters[k].status(now) for k in self.keys}
-        total_used = sum(v['used'] for v in per_key.values())
-        total_available = sum(v['available'] for v in per_key.values())
-        capacity = sum(v['limit'] for v in per_key.values())
+        per_key = {}
+        total_used = total_available = capacity = 0
+        for key, bucket in zip(self.keys, self._buckets):
+            per_key[key] = entry = bucket.status(now)
+            total_used += entry['used']
+            total_available += entry['available']
+            capacity += entry['limit']
         return {
             'total_used': total_used,
             'total_available': total_available,
@@ -147,12 +293,18 @@ class KeyedRateLimiter:
 
 # Global rate limiter instance (KeyedRateLimiter)
 _rate_limiter: KeyedRateLimiter | None = None
+_rate_limiter_init_lock = asyncio.Lock()
 
 
 async def get_rate_limiter() -> KeyedRateLimiter:
     """Get the global keyed rate limiter instance."""
     global _rate_limiter
     if _rate_limiter is None:
-        keys = config.MOLTBOOK_API_KEYS
-        _rate_limiter = KeyedRateLimiter(keys=keys, calls_per_minute=config.MOLTBOOK_API_RATE_LIMIT)
+        # Defensive only: construction is synchronous, so nothing can
+        # interleave between the check and the assignment today. The lock
+        # matters only if building the limiter ever needs to await
+        async with _rate_limiter_init_lock:
+            if _rate_limiter is None:
+                keys = config.MOLTBOOK_API_KEYS
+                _rate_limiter = KeyedRateLimiter(keys=keys, calls_per_minute=config.MOLTBOOK_API_RATE_LIMIT)
     return _rate_limiter
@@ -0,0 +1,65 @@
+import asyncio
+
+from observatory.cache import Cache
+
+
+def test_concurrent_misses_compute_once():
+    """Two concurrent misses on the same key should call compute_fn only once."""
+
+    async def run():
+        cache = Cache()
+        calls = []
+        release = asyncio.Event()
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return "value"
+
+        first = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        second = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        # Let both callers miss and queue on the key's lock
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(first, second) == ["value", "value"]
+        assert calls == [1]
+
+    asyncio.run(run())
+
+
+def test_clear_keeps_held_lock():
+    """clear() must not drop a key's lock while a computation holds it."""
+
+    async def run():
+        cache = Cache()
+        calls = []
+        release = asyncio.Event()
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return len(calls)
+
+        first = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        lock = cache._locks["k"]
+        assert lock.locked()
+
+        cache.clear("k")
+        cache.clear_all()
+        assert cache._locks["k"] is lock
+
+        # A later miss still waits on the same lock and reuses the result
+        second = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(first, second) == [1, 1]
+        assert calls == [1]
+
+        # Once released, clearing the key forgets its lock
+        cache.clear("k")
+        assert "k" not in cache._locks
+
+    asyncio.run(run())
@@ -0,0 +1,66 @@
+import asyncio
+
+from observatory.poller import client as client_module
+
+
+class FakeLimiter:
+    """Stand-in keyed limiter that hands out one key without waiting."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def wait_and_get_key(self):
+        self.calls += 1
+        return "k1"
+
+
+def test_client_resolves_limiter_lazily():
+    """A client built without get_client() should resolve the rate limiter on first use."""
+
+    async def run():
+        limiter = FakeLimiter()
+
+        async def fake_getter():
+            return limiter
+
+        client = client_module.MoltbookClient()
+        client._rate_limiter_getter = fake_getter
+        try:
+            assert await client._auth_headers() == {"Authorization": "Bearer k1"}
+            assert client._rate_limiter is limiter
+            assert limiter.calls == 1
+        finally:
+            await client.close()
+
+    asyncio.run(run())
+
+
+def test_get_posts_many_keeps_order_and_bounds_concurrency():
+    """get_posts_many should return results in submolt order, exceptions in place, with at most `concurrency` requests in flight."""
+
+    async def run():
+        client = client_module.MoltbookClient()
+        in_flight = {"now": 0, "max": 0}
+
+        async def fake_get_posts(sort="new", limit=25, submolt=None):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0)
+            in_flight["now"] -= 1
+            if submolt == "bad":
+                raise RuntimeError("boom")
+            return {"submolt": submolt, "sort": sort, "limit": limit}
+
+        client.get_posts = fake_get_posts
+        try:
+            submolts = ["a", "b", "bad", "c", "d"]
+            results = await client.get_posts_many(submolts, sort="hot", limit=5, concurrency=2)
+        finally:
+            await client.close()
+
+        assert [r["submolt"] for r in results if isinstance(r, dict)] == ["a", "b", "c", "d"]
+        assert isinstance(results[2], RuntimeError)
+        assert results[0] == {"submolt": "a", "sort": "hot", "limit": 5}
+        assert in_flight["max"] == 2
+
+    asyncio.run(run())
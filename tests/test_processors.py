@@ -0,0 +1,137 @@
+import asyncio
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from observatory.config import config
+from observatory.database import close_db, get_db, init_db, write_transaction
+from observatory.poller import processors
+
+SAMPLES = Path(__file__).resolve().parent.parent / "sample_API_calls_json"
+
+
+def load_sample(name):
+    with open(SAMPLES / f"{name}.json") as f:
+        return json.load(f)
+
+
+@pytest.fixture(autouse=True)
+def temp_database(tmp_path, monkeypatch):
+    """Point the writer and read pool at a fresh database for each test."""
+    monkeypatch.setattr(config, "DATABASE_PATH", tmp_path / "observatory.db")
+
+
+def run_with_db(body):
+    """Run body() against an initialised database, closing it afterwards."""
+
+    async def run():
+        await init_db()
+        try:
+            await body()
+        finally:
+            await close_db()
+
+    asyncio.run(run())
+
+
+async def count(query, params=()):
+    db = await get_db()
+    async with db.execute(query, params) as cursor:
+        return (await cursor.fetchone())[0]
+
+
+def test_process_posts_counts_only_new_posts():
+    """process_posts should report posts not stored before, across overlapping feeds."""
+
+    async def body():
+        new = load_sample("get_posts_new")
+        hot = load_sample("get_posts_hot")
+        new_ids = {post["id"] for post in new["posts"]}
+        hot_ids = {post["id"] for post in hot["posts"]}
+
+        assert await processors.process_posts(new) == len(new_ids)
+        assert await processors.process_posts(new) == 0
+        assert await processors.process_posts(hot) == len(hot_ids - new_ids)
+        assert await count("SELECT COUNT(*) FROM posts") == len(new_ids | hot_ids)
+
+    run_with_db(body)
+
+
+def test_process_comments_counts_inserted_rows():
+    """process_comments should return the rows the batch inserted, so a repeat fetch counts 0."""
+
+    async def body():
+        sample = load_sample("get_post_with_comments")
+        post_id = sample["post"]["id"]
+        total = sum(1 for _ in processors._flatten_comments(sample["comments"]))
+        await processors.process_posts({"posts": [sample["post"]]})
+
+        assert await processors.process_comments(post_id, sample["comments"]) == total
+        assert await processors.process_comments(post_id, sample["comments"]) == 0
+        assert await count("SELECT COUNT(*) FROM comments WHERE post_id = ?", (post_id,)) == total
+
+    run_with_db(body)
+
+
+def test_write_transaction_rolls_back_on_error():
+    """A write_transaction body that raises should leave nothing behind."""
+
+    async def body():
+        with pytest.raises(RuntimeError):
+            async with write_transaction() as db:
+                await db.execute(
+                    "INSERT INTO submolts (name, first_seen_at) VALUES (?, ?)",
+                    ("doomed", "2026-01-01T00:00:00"),
+                )
+                raise RuntimeError("boom")
+
+        assert await count("SELECT COUNT(*) FROM submolts") == 0
+        assert not (await get_db()).in_transaction
+
+    run_with_db(body)
+
+
+def test_poll_cycle_rolls_back_when_a_step_fails(monkeypatch):
+    """If storing posts fails, the submolts written earlier in the cycle should roll back too."""
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    async def body():
+        monkeypatch.setattr(processors, "process_posts", fail)
+        with pytest.raises(RuntimeError):
+            await processors.process_poll_cycle(
+                submolts_data=load_sample("get_submolts"),
+                posts_data=load_sample("get_posts_new"),
+            )
+
+        assert await count("SELECT COUNT(*) FROM submolts") == 0
+
+    run_with_db(body)
+
+
+def test_poll_cycle_skips_a_failing_thread():
+    """One thread that cannot be stored should be skipped while the others commit."""
+
+    async def body():
+        sample = load_sample("get_post_with_comments")
+        post_id = sample["post"]["id"]
+        total = sum(1 for _ in processors._flatten_comments(sample["comments"]))
+        await processors.process_posts({"posts": [sample["post"]]})
+
+        # Comments on a post that was never stored violate the foreign key
+        orphan = copy.deepcopy(sample["comments"][:1])
+        orphan[0]["id"] = "orphan-comment"
+        orphan[0]["replies"] = []
+
+        counts = await processors.process_poll_cycle(
+            comments_map={"missing-post": orphan, post_id: sample["comments"]},
+        )
+
+        assert counts["comments"] == total
+        assert await count("SELECT COUNT(*) FROM comments WHERE post_id = ?", (post_id,)) == total
+        assert await count("SELECT COUNT(*) FROM comments WHERE id = 'orphan-comment'") == 0
+
+    run_with_db(body)
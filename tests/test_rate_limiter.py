@@ -109,7 +109,7 @@ def test_keyed_rate_limiter_rotation(monkeypatch):
     asyncio.run(run())
 
 
-def test_keyed_status_reporting(monkeypatch, capsys):
+def test_keyed_status_reporting(monkeypatch, caplog):
     """Status should report per-key and aggregate usage and be included in the logged message."""
 
     async def run():
@@ -149,6 +149,166 @@ def test_keyed_status_reporting(monkeypatch, capsys):
 
     asyncio.run(run())
 
-    # Confirm the printed message includes the aggregate total_used
-    out = capsys.readouterr().out
-    assert "total_used=4" in out
\ No newline at end of file
+    # Confirm the logged message includes the aggregate total_used
+    assert "total_used=4" in caplog.text
+
+
+def test_keyed_heap_rotation_multiple_calls_per_key(monkeypatch):
+    """With several calls per minute, keys should be handed out round-robin until every key is full."""
+
+    async def run():
+        current = {"t": 0.0}
+
+        def fake_time():
+            return current["t"]
+
+        sleeps = []
+
+        async def fake_sleep(duration):
+            sleeps.append(duration)
+            current["t"] += duration
+
+        monkeypatch.setattr(rl, "time", fake_time)
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+        limiter = rl.KeyedRateLimiter(keys=["k1", "k2", "k3"], calls_per_minute=2)
+
+        used = [await limiter.wait_and_get_key() for _ in range(6)]
+
+        # Free keys rotate first-in-first-out, and no key goes over its limit
+        assert used == ["k1", "k2", "k3", "k1", "k2", "k3"]
+        assert sleeps == []
+
+        # Every key is full: the next call waits for the first slot to free up
+        current["t"] = 15.0
+        key = await limiter.wait_and_get_key()
+
+        assert key == "k1"
+        assert len(sleeps) == 1
+        assert pytest.approx(sleeps[0], rel=1e-3) == 45.0
+        # By t=60 the first six calls have all left the window
+        assert limiter.status(current["t"])["total_used"] == 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_waiters_share_timer(monkeypatch):
+    """Waiters on one full bucket should share its wake-up timer and never exceed the limit."""
+
+    async def run():
+        current = {"t": 0.0}
+
+        def fake_time():
+            return current["t"]
+
+        sleeps = []
+
+        async def fake_sleep(duration):
+            sleeps.append(duration)
+            current["t"] += duration
+
+        monkeypatch.setattr(rl, "time", fake_time)
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+        limiter = rl.RateLimiter(calls_per_minute=2)
+        admitted = []
+
+        async def call():
+            await limiter.wait_if_needed()
+            admitted.append(current["t"])
+
+        await asyncio.gather(*(call() for _ in range(6)))
+
+        # One timer per refill of the window, not one per waiter
+        assert sleeps == [60.0, 60.0]
+        assert admitted == [0.0, 0.0, 60.0, 60.0, 120.0, 120.0]
+        # No 60s window ever admits more than calls_per_minute calls
+        for earlier, later in zip(admitted, admitted[2:]):
+            assert later - earlier >= 60.0
+
+    asyncio.run(run())
+
+
+def test_ring_wraps_around(monkeypatch):
+    """The call window should stay correct after more than calls_per_minute calls wrap the ring."""
+
+    async def run():
+        current = {"t": 0.0}
+
+        def fake_time():
+            return current["t"]
+
+        sleeps = []
+
+        async def fake_sleep(duration):
+            sleeps.append(duration)
+            current["t"] += duration
+
+        monkeypatch.setattr(rl, "time", fake_time)
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+        limiter = rl.RateLimiter(calls_per_minute=3)
+
+        for t in (0.0, 10.0, 20.0, 65.0, 75.0):
+            current["t"] = t
+            await limiter.wait_if_needed()
+
+        assert sleeps == []
+        assert limiter.call_times == [20.0, 65.0, 75.0]
+        assert limiter.get_usage() == (3, 0)
+
+        # Full again: wait for the call at t=20 to leave the window
+        current["t"] = 76.0
+        await limiter.wait_if_needed()
+
+        assert len(sleeps) == 1
+        assert pytest.approx(sleeps[0], rel=1e-3) == 4.0
+        assert limiter.call_times == [65.0, 75.0, 80.0]
+
+    asyncio.run(run())
+
+
+def test_single_call_limiter_dispatch():
+    """RateLimiter(1) should build the specialised RateLimiter1; other limits should not."""
+    assert type(rl.RateLimiter(calls_per_minute=1)) is rl.RateLimiter1
+    assert type(rl.RateLimiter(calls_per_minute=2)) is rl.RateLimiter
+
+    limiter = rl.RateLimiter(calls_per_minute=1)
+    assert limiter.try_acquire_now(0.0)
+    assert not limiter.try_acquire_now(59.0)
+    assert limiter.call_times == [0.0]
+    assert limiter.try_acquire_now(60.0)
+    assert limiter.get_usage(60.0) == (1, 0)
+
+
+def test_keyed_duplicate_keys_share_one_bucket(monkeypatch):
+    """A key listed twice should share one quota rather than get two buckets."""
+
+    async def run():
+        current = {"t": 0.0}
+
+        def fake_time():
+            return current["t"]
+
+        sleeps = []
+
+        async def fake_sleep(duration):
+            sleeps.append(duration)
+            current["t"] += duration
+
+        monkeypatch.setattr(rl, "time", fake_time)
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+        limiter = rl.KeyedRateLimiter(keys=["a", "a"], calls_per_minute=1)
+
+        assert limiter.keys == ["a"]
+        assert limiter.status()["capacity"] == 1
+
+        await limiter.wait_and_get_key()
+        await limiter.wait_and_get_key()
+
+        # The second call has to wait out the shared quota
+        assert len(sleeps) == 1
+        assert pytest.approx(sleeps[0], rel=1e-3) == 60.0
+
+    asyncio.run(run())
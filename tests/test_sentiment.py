@@ -0,0 +1,34 @@
+import pytest
+
+from observatory.analyzer.sentiment import analyze_sentiment, average_sentiment, score_texts
+
+
+def test_lexicon_word_polarity():
+    """A single lexicon word should score its TextBlob polarity."""
+    assert analyze_sentiment("good") == pytest.approx(0.7)
+    assert analyze_sentiment("This is GOOD!") == pytest.approx(0.7)
+
+
+def test_negation_flips_and_halves():
+    """A word after not/no/never should be flipped and halved."""
+    assert analyze_sentiment("not good") == pytest.approx(-0.35)
+    assert analyze_sentiment("never good") == pytest.approx(-0.35)
+
+
+def test_contractions_are_not_negations():
+    """Like TextBlob, a contraction such as isn't leaves the next word alone."""
+    assert analyze_sentiment("it isn't good") == pytest.approx(0.7)
+
+
+def test_empty_and_unknown_texts_are_neutral():
+    """Empty text and text without lexicon words should score 0."""
+    assert analyze_sentiment("") == 0.0
+    assert analyze_sentiment("xyzzy plugh") == 0.0
+    assert average_sentiment([]) == 0.0
+    assert average_sentiment(["", ""]) == 0.0
+
+
+def test_score_texts_matches_single_scoring():
+    """Batch scoring should give the same polarity as scoring each text alone."""
+    texts = ["good", "not good", "xyzzy", "good and bad"]
+    assert score_texts(texts) == [analyze_sentiment(t) for t in texts]